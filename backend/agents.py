@@ -1,170 +1,285 @@
+import asyncio
 import json
 from abc import ABC, abstractmethod
 from typing import List, Tuple, Dict
-from game_engine import GameState, Team, CardState, CardType
-from llm import LLMService
+from game_engine import GameState, Team, CardState, CardType, ClueValidator, format_board, format_clue_history, group_unrevealed_words
+from llm import get_batcher, SMALL_MODELS
+
+# Number of candidate clues requested concurrently per Spymaster turn
+CLUE_CANDIDATES = 3
+
+# Guesses the verifier scores below this are dropped
+VERIFY_THRESHOLD = 0.3
+
+# Output schemas enforced by the provider. Reasoning stays ahead of the clue so
+# the model thinks before committing to a word; the streamed "word" is still
+# validated as soon as it completes.
+SPYMASTER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "reasoning": {"type": "string"},
+        "word": {"type": "string"},
+        "number": {"type": "integer"}
+    },
+    "required": ["reasoning", "word", "number"],
+    "additionalProperties": False
+}
+
+VERIFIER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "number"}
+    },
+    "required": ["score"],
+    "additionalProperties": False
+}
+
+GUESSER_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "reasoning": {"type": "string"},
+        "words": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["reasoning", "words"],
+    "additionalProperties": False
+}
+
+
+def _validate_clue(clue_word: str, validator: ClueValidator) -> None:
+    """Substring and board-word check against unrevealed words (sync with engine)."""
+    conflict = validator.conflict(clue_word)
+    if not conflict:
+        return
+    kind, board_word = conflict
+    board_word = board_word.upper()
+    if kind == "on_board":
+        raise ValueError(f"Clue '{clue_word}' is on the board")
+    if kind == "contains":
+        raise ValueError(f"Clue '{clue_word}' contains board word '{board_word}' as substring")
+    raise ValueError(f"Clue '{clue_word}' is part of board word '{board_word}'")
+
+# Static system prompts, built once at import; per-turn state goes in the user prompt.
+SPYMASTER_RULES = """You are an expert Codenames Spymaster.
+Your goal is to be the FIRST to contact all your team's words. You want to beat the opponent.
+Give a single-word clue that connects as many of your team's cards as possible, while strictly avoiding (in order of importance) the Assassin, the Opposing team's cards, and the Neutral cards.
+
+STRATEGY:
+1. Look for semantic intersections between 2, 3, or more of your words.
+2. "Stretch" connections are okay if they are distinct from the "Bad" words.
+3. Prioritize clues with numbers >= 2. A clue for 1 word is weak unless it's the last one.
+4. Keep in mind that Guessers will look at previous clues from you to see if they missed any connections. You can use this to "guide" them toward words that were previously hinted at but not guessed.
+5. ABSOLUTELY forbidden to give a clue that relates more strongly to the Assassin than your target words.
+
+RULES:
+1. Clue must be a single word (no spaces, no hyphens).
+2. Clue cannot be any of the words currently visible on the board (unrevealed).
+3. Clue cannot contain a board word as a substring (e.g. "PINEAPPLE" for "APPLE"), and a board word cannot contain the clue as a substring.
+
+Output JSON format:
+{
+    "reasoning": "Brief and concise thought process (max 2 sentences)",
+    "word": "CLUE_WORD",
+    "number": INTEGER
+}
+"""
+
+GUESSER_RULES = """You are an expert Codenames Guesser.
+Your Spymaster gives you a clue associated with a number of cards. You are trying to find all your words before your opponent does.
+
+STRATEGY:
+1. Analyze the clue for all possible meanings (polysemy).
+2. Rank the unrevealed words on the board by their semantic distance to the clue.
+3. Select the top N words that are strongest matches, where N is the clue's number.
+4. CONTEXT MATTERS: Look at your Spymaster's PREVIOUS clues in the Game History. If they previously gave a clue that you didn't fully resolve (e.g., they said "Animal 2" and you only guessed "DOG"), consider if the current clue helps confirm those old words as well.
+5. If you are very confident (often due to historical context), you can guess one extra word (N + 1) to catch up on missed previous clues.
+6. It is risky to guess if the next best word is weak or ambiguous.
+
+Output JSON format:
+{
+    "reasoning": "Brief and concise analysis (max 2 sentences)",
+    "words": ["GUESS_1", "GUESS_2"]
+}
+If you have no confident guesses, return ["END_TURN"] in the words list.
+"""
+
+VERIFIER_RULES = """You review guesses in the word game Codenames.
+Given a clue and one board word, rate how strongly the clue points to that word, considering all common meanings of the clue.
+Return a score from 0.0 (no plausible connection) to 1.0 (obvious, unambiguous connection).
+
+Output JSON format:
+{
+    "score": NUMBER
+}
+"""
+
+# Per-turn user prompts, filled with str.format_map
+SPYMASTER_PROMPT = """You are the Spymaster for Team {team}.
+
+Game History:
+{history}
+
+Your remaining words: {my_words}
+BAD words (Avoid!): {assassin} (Assassin), {opp_words} (Opponent)
+
+{board}"""
+
+GUESSER_PROMPT = """You are the Guesser for Team {team}.
+The Spymaster has given you the clue: "{clue_word}" associated with {clue_number} cards.
+
+Game History:
+{history}
+
+{board}"""
+
+VERIFIER_PROMPT = 'Clue: "{clue_word}"\nWord: "{word}"'
 
 class Agent(ABC):
     def __init__(self, team: Team, llm_provider: str = "openai", llm_model: str = None):
         self.team = team
-        self.llm = LLMService(provider=llm_provider, model=llm_model)
+        self.llm = get_batcher(provider=llm_provider, model=llm_model)
 
     @abstractmethod
     async def get_move(self, game_state: GameState) -> dict:
         pass
     
     def _format_board(self, game_state: GameState, is_spymaster: bool) -> str:
-        board_str = "Current Board:\n"
-        for card in game_state.cards:
-            status = "(REVEALED)" if card.revealed else ""
-            if is_spymaster or card.revealed:
-                # Spymaster sees everything, or everyone sees revealed
-                type_str = card.type.value
-            else:
-                type_str = "UNKNOWN"
-                
-            board_str += f"- {card.word} [{type_str}] {status}\n"
-        return board_str
+        # Prefer the strings the engine cached for this state
+        cached = game_state.board_view_spymaster if is_spymaster else game_state.board_view_public
+        return cached if cached is not None else format_board(game_state.cards, is_spymaster)
     
-    def _format_clue_history(self, clue_history: List[Dict]) -> str:
-        """Format clue history concisely for LLM context."""
-        if not clue_history:
-            return "No clues given yet."
-        
-        lines = []
-        for entry in clue_history:
-            team = entry.get("team", "?")
-            clue = entry.get("clue", "?")
-            number = entry.get("number", 0)
-            guesses = entry.get("guesses", [])
-            
-            if guesses:
-                guess_strs = [f"{g['word']}({g['result']})" for g in guesses]
-                lines.append(f"{team}: {clue} {number} → {', '.join(guess_strs)}")
-            else:
-                lines.append(f"{team}: {clue} {number} → (no guesses yet)")
-        
-        return "\n".join(lines)
+    def _unrevealed_words(self, game_state: GameState) -> Dict[CardType, List[str]]:
+        if game_state.unrevealed_words is not None:
+            return game_state.unrevealed_words
+        return group_unrevealed_words(game_state.cards)
+
+    def _format_clue_history(self, game_state: GameState) -> str:
+        if game_state.history_view is not None:
+            return game_state.history_view
+        return format_clue_history(game_state.clue_history)
 
 class SpymasterAgent(Agent):
     async def get_move(self, game_state: GameState) -> dict:
         # 1. Identify valid targets
-        my_words = [c.word for c in game_state.cards if c.type.value == self.team.value and not c.revealed]
+        unrevealed = self._unrevealed_words(game_state)
+        my_words = unrevealed[CardType(self.team.value)]
         
         if not my_words:
              return {"word": "WIN", "number": 0, "reasoning": "No words left to hint at!"}
 
-        opp_words = [c.word for c in game_state.cards if c.type.value != self.team.value and c.type != CardType.ASSASSIN and c.type != CardType.NEUTRAL and not c.revealed]
+        opponent = CardType.BLUE if self.team == Team.RED else CardType.RED
+        opp_words = unrevealed[opponent]
+        assassin = unrevealed[CardType.ASSASSIN]
+        neutral = unrevealed[CardType.NEUTRAL]
 
-        assassin = [c.word for c in game_state.cards if c.type == CardType.ASSASSIN and not c.revealed]
-        neutral = [c.word for c in game_state.cards if c.type == CardType.NEUTRAL and not c.revealed]
+        history = self._format_clue_history(game_state)
+        board = self._format_board(game_state, is_spymaster=True)
+        # Static rules go in the system prompt, per-turn state in the user prompt
+        system_prompt = SPYMASTER_RULES
+        user_prompt = SPYMASTER_PROMPT.format_map({
+            "team": self.team.value,
+            "history": history,
+            "my_words": my_words,
+            "assassin": assassin,
+            "opp_words": opp_words,
+            "board": board
+        })
 
-        history = self._format_clue_history(game_state.clue_history)
-        system_prompt = f"""
-        You are an expert Codenames Spymaster for Team {self.team.value}.
-        Your goal is to be the FIRST to contact all your team's words. You want to beat the opponent.
-        Give a single-word clue that connects as many of your team's cards as possible, while strictly avoiding (in order of importance) the Assassin, the Opposing team's cards, and the Neutral cards.
-        
-        STRATEGY:
-        1. Look for semantic intersections between 2, 3, or more of your words.
-        2. "Stretch" connections are okay if they are distinct from the "Bad" words.
-        3. Prioritize clues with numbers >= 2. A clue for 1 word is weak unless it's the last one.
-        4. Keep in mind that Guessers will look at previous clues from you to see if they missed any connections. You can use this to "guide" them toward words that were previously hinted at but not guessed.
-        5. ABSOLUTELY forbidden to give a clue that relates more strongly to the Assassin than your target words.
-        
-        RULES:
-        1. Clue must be a single word (no spaces, no hyphens).
-        2. Clue cannot be any of the words currently visible on the board (unrevealed).
-        3. Clue cannot contain a board word as a substring (e.g. "PINEAPPLE" for "APPLE"), and a board word cannot contain the clue as a substring.
-
-        
-        Game History:
-        {history}
-        
-        Your remaining words: {my_words}
-        BAD words (Avoid!): {assassin} (Assassin), {opp_words} (Opponent)
-        
-        Output JSON format: 
-        {{
-            "reasoning": "Brief and concise thought process (max 2 sentences)",
-            "word": "CLUE_WORD", 
-            "number": INTEGER
-        }}
-        """
-        
-        user_prompt = self._format_board(game_state, is_spymaster=True)
+        # Speculative fan-out: request several candidate clues at once and take the
+        # first valid one, instead of paying for each retry sequentially.
+        validator = ClueValidator(my_words + opp_words + assassin + neutral)
+        candidates = [
+            # Only the first candidate may be served from cache; the rest must be fresh
+            # so a cached invalid clue can't fail every candidate
+            asyncio.ensure_future(self.llm.submit(
+                system_prompt,
+                user_prompt,
+                use_cache=(i == 0),
+                check_word=lambda word: _validate_clue(word.upper().strip(), validator),
+                schema=SPYMASTER_SCHEMA,
+                schema_name="give_clue"
+            ))
+            for i in range(CLUE_CANDIDATES)
+        ]
 
-        
-        valid = False
-        attempts = 0
-        response = {}
-        
-        while not valid and attempts < 3:
-            try:
-                response = await self.llm.generate_response(system_prompt, user_prompt)
-                clue_word = response.get("word", "").upper().strip()
-                
-                # Validation: Substring and board-word check (sync with engine)
-                for c in game_state.cards:
-                    if c.revealed: continue
-                    board_word = c.word.upper()
-                    
-                    if clue_word == board_word:
-                        raise ValueError(f"Clue '{clue_word}' is on the board")
-                    if board_word in clue_word:
-                        raise ValueError(f"Clue '{clue_word}' contains board word '{board_word}' as substring")
-                    if clue_word in board_word:
-                        raise ValueError(f"Clue '{clue_word}' is part of board word '{board_word}'")
-                
-                valid = True
-            except Exception as e:
-                attempts += 1
-                print(f"Agent retry {attempts}: {e}")
-        
-        if not valid:
-            # Fallback
-            return {"word": "PASS", "number": 0, "reasoning": "Failed to generate valid clue."}
+        try:
+            for attempt, candidate in enumerate(asyncio.as_completed(candidates), start=1):
+                try:
+                    response = await candidate
+                    clue_word = response.get("word", "").upper().strip()
+                    _validate_clue(clue_word, validator)
+                    return {"word": response["word"], "number": response["number"], "reasoning": response.get("reasoning", "")}
+                except Exception as e:
+                    print(f"Agent candidate {attempt} rejected: {e}")
+        finally:
+            # Stop paying for the remaining candidates once one is accepted
+            for pending in candidates:
+                pending.cancel()
 
-        return {"word": response["word"], "number": response["number"], "reasoning": response.get("reasoning", "")}
+        # Fallback
+        return {"word": "PASS", "number": 0, "reasoning": "Failed to generate valid clue."}
 
 class GuesserAgent(Agent):
+    def __init__(self, team: Team, llm_provider: str = "openai", llm_model: str = None):
+        super().__init__(team, llm_provider=llm_provider, llm_model=llm_model)
+        self.verifier = get_batcher(provider=llm_provider, model=SMALL_MODELS[llm_provider])
+
     async def get_move(self, game_state: GameState) -> dict:
         if not game_state.last_clue:
             return {"action": "END_TURN"}
             
         clue_word, clue_number = game_state.last_clue
         
-        history = self._format_clue_history(game_state.clue_history)
-        system_prompt = f"""
-        You are an expert Codenames Guesser for Team {self.team.value}.
-        The Spymaster has given you the clue: "{clue_word}" associated with {clue_number} cards. You are trying to find all your words before your opponent does.
-        
-        STRATEGY:
-        1. Analyze the clue "{clue_word}" for all possible meanings (polysemy).
-        2. Rank the unrevealed words on the board by their semantic distance to the clue.
-        3. Select the top {clue_number} words that are strongest matches.
-        4. CONTEXT MATTERS: Look at your Spymaster's PREVIOUS clues in the Game History. If they previously gave a clue that you didn't fully resolve (e.g., they said "Animal 2" and you only guessed "DOG"), consider if "{clue_word}" helps confirm those old words as well.
-        5. If you are very confident (often due to historical context), you can guess one extra word (clue_number + 1) to catch up on missed previous clues.
-        6. It is risky to guess if the next best word is weak or ambiguous.
-        
-        Game History:
-        {history}
-        
-        Output JSON format: 
-        {{
-            "reasoning": "Brief and concise analysis (max 2 sentences)",
-            "words": ["GUESS_1", "GUESS_2"]
-        }}
-        If you have no confident guesses, return ["END_TURN"] in the words list.
-        """
-        
-        user_prompt = self._format_board(game_state, is_spymaster=False)
+        history = self._format_clue_history(game_state)
+        board = self._format_board(game_state, is_spymaster=False)
+        system_prompt = GUESSER_RULES
+        user_prompt = GUESSER_PROMPT.format_map({
+            "team": self.team.value,
+            "clue_word": clue_word,
+            "clue_number": clue_number,
+            "history": history,
+            "board": board
+        })
 
-        
-        response = await self.llm.generate_response(system_prompt, user_prompt)
+        response = await self.llm.submit(system_prompt, user_prompt, schema=GUESSER_SCHEMA, schema_name="guess_words")
         
         words = response.get("words", [])
         if "END_TURN" in words:
             return {"action": "END_TURN", "reasoning": response.get("reasoning", "Decided to end turn.")}
+
+        reasoning = response.get("reasoning", "")
+        words, dropped = await self._verify_guesses(clue_word, words)
+        if dropped:
+            reasoning = f"{reasoning} (Verifier dropped: {', '.join(dropped)})"
+        if not words:
+            return {"action": "END_TURN", "reasoning": reasoning}
             
-        return {"words": words, "reasoning": response.get("reasoning", "")}
+        return {"words": words, "reasoning": reasoning}
+
+    async def _verify_guesses(self, clue_word: str, words: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Second opinion from a small model, one call per candidate in parallel.
+        Returns (kept words sorted by score, dropped words).
+        """
+        results = await asyncio.gather(
+            *[self.verifier.submit(VERIFIER_RULES, VERIFIER_PROMPT.format_map({"clue_word": clue_word, "word": word}), schema=VERIFIER_SCHEMA, schema_name="score_guess")
+              for word in words],
+            return_exceptions=True
+        )
+
+        scores = {}
+        for word, result in zip(words, results):
+            if isinstance(result, Exception):
+                # A failed check shouldn't veto the guess; keep it, ranked last
+                print(f"Verifier failed for {word}: {result}")
+                scores[word] = VERIFY_THRESHOLD
+                continue
+            try:
+                scores[word] = float(result.get("score", VERIFY_THRESHOLD))
+            except (AttributeError, TypeError, ValueError):
+                # Same for a reply without a usable score (schema-less providers)
+                print(f"Verifier gave no usable score for {word}: {result!r}")
+                scores[word] = VERIFY_THRESHOLD
+
+        kept = sorted((w for w in words if scores[w] >= VERIFY_THRESHOLD), key=lambda w: -scores[w])
+        dropped = [w for w in words if scores[w] < VERIFY_THRESHOLD]
+        return kept, dropped
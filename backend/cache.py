@@ -0,0 +1,97 @@
+import os
+import pickle
+import asyncio
+import hashlib
+import tempfile
+from collections import OrderedDict
+from typing import Optional
+
+
+class CacheService:
+    """
+    Exact-match cache for LLM responses, keyed by a hash of the full prompt.
+
+    Prompts are built deterministically from the game state, so a repeated
+    board position (retries, replays, re-triggered agent moves) produces the
+    same key and can be answered locally instead of with another round-trip.
+    """
+
+    def __init__(self, max_entries: int = 1024, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._save_task: Optional[asyncio.Task] = None
+        self._save_again = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    self._entries.update(pickle.load(f))
+            except (pickle.UnpicklingError, EOFError, OSError) as e:
+                print(f"Ignoring unreadable LLM cache at {path}: {e}")
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        response = self._entries.get(key)
+        if response is not None:
+            self._entries.move_to_end(key)
+            # Hand out a copy so callers can't mutate the cached entry
+            return dict(response)
+        return None
+
+    def put(self, key: str, response: dict):
+        self._entries[key] = dict(response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def snapshot(self) -> dict:
+        return dict(self._entries)
+
+    def schedule_save(self):
+        """
+        Persist the cache in the background. Only one write runs at a time;
+        saves requested meanwhile collapse into one more write after it.
+        """
+        if not self.path:
+            return
+        if self._save_task is not None and not self._save_task.done():
+            self._save_again = True
+            return
+        self._save_task = asyncio.get_running_loop().create_task(self._save_loop())
+
+    async def _save_loop(self):
+        while True:
+            self._save_again = False
+            await asyncio.to_thread(self.save, self.snapshot())
+            if not self._save_again:
+                return
+
+    async def flush(self):
+        """Wait for any pending background save."""
+        if self._save_task is not None and not self._save_task.done():
+            await self._save_task
+
+    def save(self, entries: dict):
+        """Write a snapshot to disk. Safe to call from a worker thread; never raises."""
+        if not self.path:
+            return
+        # Unique temp file next to the target, then an atomic rename into place
+        directory, name = os.path.split(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f"{name}.", suffix=".tmp")
+        except OSError as e:
+            print(f"Failed to save LLM cache to {self.path}: {e}")
+            return
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except (OSError, pickle.PicklingError) as e:
+            print(f"Failed to save LLM cache to {self.path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
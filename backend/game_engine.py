@@ -1,8 +1,12 @@
+import os
 import random
-import json
+import asyncio
+import threading
+import orjson
 from enum import Enum
+from dataclasses import dataclass
 from typing import List, Optional, Tuple, Dict
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import uuid
 
 
@@ -18,7 +22,8 @@ class CardType(str, Enum):
     NEUTRAL = "NEUTRAL"
     ASSASSIN = "ASSASSIN"
 
-class CardState(BaseModel):
+@dataclass(slots=True)
+class CardState:
     word: str
     type: CardType
     revealed: bool = False
@@ -31,6 +36,76 @@ class CardState(BaseModel):
             "team": self.type if (is_spymaster or self.revealed or game_over) else None # Alias for frontend convenience
         }
 
+class ClueValidator:
+    """
+    Unrevealed board words prepared for clue checks. A set lookup and one scan
+    over the joined words replace a pair of substring tests per card.
+    """
+
+    def __init__(self, words: List[str]):
+        self.words = {w.upper(): w for w in words}
+        self._by_length = sorted(self.words, key=len)
+        # Newline can't appear in a clue we accept, so it safely separates words
+        self._joined = "\n".join(self._by_length)
+
+    def conflict(self, clue_upper: str) -> Optional[Tuple[str, str]]:
+        """
+        Return (kind, board_word) for the first rule the clue breaks, or None.
+        kind is "on_board", "contains" (clue contains a board word) or
+        "part_of" (a board word contains the clue).
+        """
+        if clue_upper in self.words:
+            return "on_board", self.words[clue_upper]
+        # Only strictly shorter board words can be substrings of the clue
+        for board_upper in self._by_length:
+            if len(board_upper) >= len(clue_upper):
+                break
+            if board_upper in clue_upper:
+                return "contains", self.words[board_upper]
+        if clue_upper in self._joined:
+            board_upper = next((w for w in self._by_length if clue_upper in w), None)
+            if board_upper is not None:
+                return "part_of", self.words[board_upper]
+        return None
+
+def format_board(cards: List[CardState], is_spymaster: bool) -> str:
+    """Board listing for agent prompts; Spymasters see every card's type."""
+    parts = ["Current Board:\n"]
+    for card in cards:
+        status = "(REVEALED)" if card.revealed else ""
+        # Spymaster sees everything, or everyone sees revealed
+        type_str = card.type.value if (is_spymaster or card.revealed) else "UNKNOWN"
+        parts.append(f"- {card.word} [{type_str}] {status}\n")
+    return "".join(parts)
+
+def group_unrevealed_words(cards: List[CardState]) -> Dict[CardType, List[str]]:
+    """Unrevealed words grouped by card type, in one pass over the board."""
+    grouped = {t: [] for t in CardType}
+    for card in cards:
+        if not card.revealed:
+            grouped[card.type].append(card.word)
+    return grouped
+
+def format_clue_history(clue_history: List[Dict]) -> str:
+    """Format clue history concisely for LLM context."""
+    if not clue_history:
+        return "No clues given yet."
+
+    lines = []
+    for entry in clue_history:
+        team = entry.get("team", "?")
+        clue = entry.get("clue", "?")
+        number = entry.get("number", 0)
+        guesses = entry.get("guesses", [])
+
+        if guesses:
+            guess_strs = [f"{g['word']}({g['result']})" for g in guesses]
+            lines.append(f"{team}: {clue} {number} → {', '.join(guess_strs)}")
+        else:
+            lines.append(f"{team}: {clue} {number} → (no guesses yet)")
+
+    return "\n".join(lines)
+
 class GamePhase(str, Enum):
     RED_SPYMASTER = "RED_SPYMASTER"
     RED_GUESSER = "RED_GUESSER"
@@ -66,12 +141,200 @@ class GameState(BaseModel):
     log: List[str] = []
     clue_history: List[Dict] = []  # [{team, clue, number, guesses: [{word, result}]}]
     reasoning_log: List[Dict] = [] # [{role: str, action: str, reasoning: str, timestamp: str}]
+    # Prompt strings precomputed by the engine for agents; never sent to clients
+    board_view_spymaster: Optional[str] = Field(default=None, exclude=True)
+    board_view_public: Optional[str] = Field(default=None, exclude=True)
+    history_view: Optional[str] = Field(default=None, exclude=True)
+    unrevealed_words: Optional[Dict[CardType, List[str]]] = Field(default=None, exclude=True)
 
 
 
     class Config:
         arbitrary_types_allowed = True
 
+# Default word list, used when a game config doesn't provide one
+_DEFAULT_WORDS: Tuple[str, ...] = (
+    "AFRICA", "AGENT", "AIR", "ALIEN", "ALPS", "AMAZON", "AMBULANCE", "AMERICA", "ANGEL", "ANTARCTICA",
+    "APPLE", "ARM", "ATLANTIS", "AUSTRALIA", "AZTEC", "BACK", "BALL", "BAND", "BANK", "BAR",
+    "BARK", "BAT", "BATTERY", "BEACH", "BEAR", "BEAT", "BED", "BEIJING", "BELL", "BELT",
+    "BERLIN", "BERMUDA", "BERRY", "BILL", "BLOCK", "BOARD", "BOLT", "BOMB", "BOND", "BOOM",
+    "BOOT", "BOTTLE", "BOW", "BOX", "BRIDGE", "BRUSH", "BUCK", "BUFFALO", "BUG", "BUGLE",
+    "BUTTON", "CALF", "CANADA", "CAP", "CAPITAL", "CAR", "CARD", "CARROT", "CASINO", "CAST",
+    "CAT", "CELL", "CENTAUR", "CENTER", "CHAIR", "CHANGE", "CHARGE", "CHECK", "CHEST", "CHICK",
+    "CHINA", "CHOCOLATE", "CHURCH", "CIRCLE", "CLIFF", "CLOAK", "CLUB", "CODE", "COLD", "COMIC",
+    "COMPOUND", "CONCERT", "CONDUCTOR", "CONTRACT", "COOK", "COPPER", "COTTON", "COURT", "COVER", "CRANE",
+    "CRASH", "CRICKET", "CROSS", "CROWN", "CYCLE", "CZECH", "DANCE", "DATE", "DAY", "DEATH",
+    "DECK", "DEGREE", "DIAMOND", "DICE", "DINOSAUR", "DISEASE", "DOCTOR", "DOG", "DRAFT", "DRAGON",
+    "DRESS", "DRILL", "DROP", "DUCK", "DWARF", "EAGLE", "EGYPT", "EMBASSY", "ENGINE", "ENGLAND",
+    "EUROPE", "EYE", "FACE", "FAIR", "FALL", "FAN", "FENCE", "FIELD", "FIGHTER", "FIGURE",
+    "FILE", "FILM", "FIRE", "FISH", "FLUTE", "FLY", "FOOT", "FORCE", "FOREST", "FORK",
+    "FRANCE", "GAME", "GAS", "GENIUS", "GERMANY", "GHOST", "GIANT", "GLASS", "GLOVE", "GOLD",
+    "GRACE", "GRASS", "GREECE", "GREEN", "GROUND", "HAM", "HAND", "HAWK", "HEAD", "HEART",
+    "HELICOPTER", "HIMALAYAS", "HOLE", "HOLLYWOOD", "HONEY", "HOOD", "HOOK", "HORN", "HORSE",
+    "HORSESHOE", "HOSPITAL", "HOTEL", "ICE", "ICE CREAM", "INDIA", "IRON", "IVORY", "JACK",
+    "JAM", "JET", "JUPITER", "KANGAROO", "KETCHUP", "KEY", "KID", "KING", "KIWI", "KNIFE",
+    "KNIGHT", "LAB", "LAP", "LASER", "LAWYER", "LEAD", "LEMON", "LEPRECHAUN", "LIFE", "LIGHT",
+    "LIMOUSINE", "LINE", "LINK", "LION", "LITTER", "LOCH NESS", "LOCK", "LOG", "LONDON", "LUCK",
+    "MAIL", "MAMMOTH", "MAPLE", "MARBLE", "MARCH", "MASS", "MATCH", "MERCURY", "MEXICO",
+    "MICROSCOPE", "MILLIONAIRE", "MINE", "MINT", "MISSILE", "MODEL", "MOLE", "MOON", "MOSCOW",
+    "MOUNT", "MOUSE", "MOUTH", "MUG", "NAIL", "NEEDLE", "NET", "NEW YORK", "NIGHT", "NINJA",
+    "NOTE", "NOVEL", "NURSE", "NUT", "OCTOPUS", "OIL", "OLIVE", "OLYMPUS", "OPERA", "ORANGE",
+    "ORGAN", "PALM", "PAN", "PANTS", "PAPER", "PARACHUTE", "PARK", "PART", "PASS", "PASTE",
+    "PENGUIN", "PHOENIX", "PIANO", "PIE", "PILOT", "PIN", "PIPE", "PIRATE", "PISTOL", "PIT",
+    "PITCH", "PLANE", "PLASTIC", "PLATE", "PLATYPUS", "PLAY", "PLOT", "POINT", "POISON",
+    "POLE", "POLICE", "POOL", "PORT", "POST", "POUND", "PRESS", "PRINCESS", "PUMPKIN", "PUPIL",
+    "PYRAMID", "QUEEN", "RABBIT", "RACKET", "RAY", "REVOLUTION", "RING", "ROBIN", "ROBOT",
+    "ROCK", "ROME", "ROOT", "ROSE", "ROULETTE", "ROUND", "ROW", "RULER", "SATELLITE", "SATURN",
+    "SCALE", "SCHOOL", "SCIENTIST", "SCORPION", "SCREEN", "SCUBA DIVER", "SEAL", "SERVER",
+    "SHADOW", "SHAKESPEARE", "SHARK", "SHIP", "SHOE", "SHOP", "SHOT", "SINK", "SKYSCRAPER",
+    "SLIP", "SLUG", "SMUGGLER", "SNOW", "SNOWMAN", "SOCK", "SOLDIER", "SOUL", "SOUND", "SPACE",
+    "SPELL", "SPIDER", "SPIKE", "SPINE", "SPOT", "SPRING", "SPY", "SQUARE", "STADIUM", "STAFF",
+    "STAR", "STATE", "STICK", "STOCK", "STRAW", "STREAM", "STRIKE", "STRING", "SUB", "SUIT",
+    "SUPERHERO", "SWING", "SWITCH", "TABLE", "TABLET", "TAG", "TAIL", "TAP", "TEACHER",
+    "TELESCOPE", "TEMPLE", "THEATER", "THIEF", "THUMB", "TICK", "TIE", "TIME", "TOKYO",
+    "TOOTH", "TORCH", "TOWER", "TRACK", "TRAIN", "TRIANGLE", "TRIP", "TRUNK", "TUBE", "TURKEY",
+    "UNDERTAKER", "UNICORN", "VACUUM", "VAN", "VET", "WAKE", "WALL", "WAR", "WASHER",
+    "WASHINGTON", "WATCH", "WATER", "WAVE", "WEB", "WELL", "WHALE", "WHIP", "WIND", "WITCH",
+    "WORM", "YARD"
+)
+
+# Board size -> (red, blue, assassin) card counts; the rest are neutral
+_DISTRIBUTIONS: Dict[int, Tuple[int, int, int]] = {
+    25: (9, 8, 1),
+    36: (12, 11, 2),
+    49: (17, 16, 2),
+    64: (20, 19, 3)
+}
+
+# Append-only summary of saved games, one JSON line per save (last line per game wins)
+HISTORY_INDEX = "history/index.jsonl"
+HISTORY_PREFIX = "game_history_"
+# Compact the index once superseded lines outnumber live entries (and it isn't tiny)
+HISTORY_INDEX_MIN_COMPACT = 256
+
+# Appends come from the history writer thread, reads and rebuilds from API worker
+# threads; holding this around each keeps a rebuild from dropping a concurrent save
+_history_index_lock = threading.Lock()
+
+def scan_history_files(history_dir: str = "history") -> List[os.DirEntry]:
+    # One scandir pass with plain string checks, no Path objects or fnmatch
+    with os.scandir(history_dir) as it:
+        return [e for e in it if e.name.startswith(HISTORY_PREFIX) and e.name.endswith(".json")]
+
+def history_game_id(filename: str) -> str:
+    return filename[len(HISTORY_PREFIX):-len(".json")]
+
+def _append_history_index(game_id: str, winner: Optional[Team], final_score: Dict, has_cards: bool):
+    entry = {"game_id": game_id, "winner": winner, "final_score": final_score, "has_cards": has_cards}
+    line = orjson.dumps(entry, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    with _history_index_lock:
+        # Only extend an existing index; a missing one is rebuilt from the files
+        if not os.path.exists(HISTORY_INDEX):
+            return
+        with open(HISTORY_INDEX, "ab") as f:
+            f.write(line)
+
+def _load_history_summary(game_file: os.DirEntry) -> dict:
+    game_id = history_game_id(game_file.name)
+    try:
+        with open(game_file.path, "rb") as f:
+            data = orjson.loads(f.read())
+        return {
+            "game_id": game_id,
+            "winner": data.get("winner"),
+            "final_score": data.get("final_score"),
+            "has_cards": "cards" in data
+        }
+    except (orjson.JSONDecodeError, OSError):
+        return {
+            "game_id": game_id,
+            "winner": None,
+            "final_score": None,
+            "has_cards": False,
+            "error": "corrupted"
+        }
+
+def _write_history_index(entries: List[dict]):
+    tmp_path = f"{HISTORY_INDEX}.tmp"
+    with open(tmp_path, "wb") as f:
+        for entry in entries:
+            f.write(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+    os.replace(tmp_path, HISTORY_INDEX)
+
+def read_history_index() -> List[dict]:
+    """Latest summary per game from the index, compacting it when it has grown stale."""
+    with _history_index_lock:
+        entries: Dict[str, dict] = {}
+        lines = 0
+        with open(HISTORY_INDEX, "rb") as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue  # Torn write; a later save of that game will append a good line
+                entries[entry["game_id"]] = entry
+        games = list(entries.values())
+        if lines > max(HISTORY_INDEX_MIN_COMPACT, 2 * len(games)):
+            _write_history_index(games)
+    return games
+
+def rebuild_history_index(history_dir: str = "history") -> List[dict]:
+    """Summarize every history file and write a fresh index from them."""
+    with _history_index_lock:
+        games = [_load_history_summary(f) for f in scan_history_files(history_dir)]
+        _write_history_index(games)
+    return games
+
+def _write_history(filename: str, data: dict):
+    # Readers run in threads too, so never expose a truncated file: write a temp
+    # file and rename it into place
+    payload = orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    tmp_path = f"{filename}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, filename)
+    _append_history_index(data["game_id"], data["winner"], data["final_score"], "cards" in data)
+
+class HistoryWriter:
+    """
+    Writes history snapshots on a background task so game moves don't block on
+    JSON encoding or disk I/O. Writes happen in submission order.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def submit(self, filename: str, data: dict):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, tests): write inline
+            _write_history(filename, data)
+            return
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        self._queue.put_nowait((filename, data))
+
+    async def _run(self):
+        while True:
+            filename, data = await self._queue.get()
+            try:
+                await asyncio.to_thread(_write_history, filename, data)
+            except (OSError, TypeError) as e:
+                print(f"Failed to save history {filename}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def flush(self):
+        """Wait until every submitted snapshot has been written."""
+        if self._queue is not None:
+            await self._queue.join()
+
+history_writer = HistoryWriter()
+
 class CodenamesGame:
     def __init__(self, id: str, config: GameConfig = GameConfig()):
         self.id = id
@@ -87,69 +350,28 @@ class CodenamesGame:
         self.log = []
         self.clue_history = []  # Structured clue log for agents
         self.reasoning_log = []
+        self._clue_validator: Optional[ClueValidator] = None  # Rebuilt lazily after reveals
+        # Agent prompt strings, rebuilt lazily once a move marks them dirty
+        self._board_str_spymaster = ""
+        self._board_str_public = ""
+        self._history_str = ""
+        self._unrevealed_words: Dict[CardType, List[str]] = {}
+        self._dirty = True
+        # Built client payloads, dropped by any move that changes them
+        self._state_cache: Optional[GameState] = None
+        self._state_dict_cache: Optional[dict] = None
         self._initialize_board()
 
     def _initialize_board(self):
         # Default word list if none provided
-        words = self.config.word_list
-        if not words:
-            words = [
-                "AFRICA", "AGENT", "AIR", "ALIEN", "ALPS", "AMAZON", "AMBULANCE", "AMERICA", "ANGEL", "ANTARCTICA",
-                "APPLE", "ARM", "ATLANTIS", "AUSTRALIA", "AZTEC", "BACK", "BALL", "BAND", "BANK", "BAR",
-                "BARK", "BAT", "BATTERY", "BEACH", "BEAR", "BEAT", "BED", "BEIJING", "BELL", "BELT",
-                "BERLIN", "BERMUDA", "BERRY", "BILL", "BLOCK", "BOARD", "BOLT", "BOMB", "BOND", "BOOM",
-                "BOOT", "BOTTLE", "BOW", "BOX", "BRIDGE", "BRUSH", "BUCK", "BUFFALO", "BUG", "BUGLE",
-                "BUTTON", "CALF", "CANADA", "CAP", "CAPITAL", "CAR", "CARD", "CARROT", "CASINO", "CAST",
-                "CAT", "CELL", "CENTAUR", "CENTER", "CHAIR", "CHANGE", "CHARGE", "CHECK", "CHEST", "CHICK",
-                "CHINA", "CHOCOLATE", "CHURCH", "CIRCLE", "CLIFF", "CLOAK", "CLUB", "CODE", "COLD", "COMIC",
-                "COMPOUND", "CONCERT", "CONDUCTOR", "CONTRACT", "COOK", "COPPER", "COTTON", "COURT", "COVER", "CRANE",
-                "CRASH", "CRICKET", "CROSS", "CROWN", "CYCLE", "CZECH", "DANCE", "DATE", "DAY", "DEATH",
-                "DECK", "DEGREE", "DIAMOND", "DICE", "DINOSAUR", "DISEASE", "DOCTOR", "DOG", "DRAFT", "DRAGON",
-                "DRESS", "DRILL", "DROP", "DUCK", "DWARF", "EAGLE", "EGYPT", "EMBASSY", "ENGINE", "ENGLAND",
-                "EUROPE", "EYE", "FACE", "FAIR", "FALL", "FAN", "FENCE", "FIELD", "FIGHTER", "FIGURE",
-                "FILE", "FILM", "FIRE", "FISH", "FLUTE", "FLY", "FOOT", "FORCE", "FOREST", "FORK",
-                "FRANCE", "GAME", "GAS", "GENIUS", "GERMANY", "GHOST", "GIANT", "GLASS", "GLOVE", "GOLD",
-                "GRACE", "GRASS", "GREECE", "GREEN", "GROUND", "HAM", "HAND", "HAWK", "HEAD", "HEART",
-                "HELICOPTER", "HIMALAYAS", "HOLE", "HOLLYWOOD", "HONEY", "HOOD", "HOOK", "HORN", "HORSE",
-                "HORSESHOE", "HOSPITAL", "HOTEL", "ICE", "ICE CREAM", "INDIA", "IRON", "IVORY", "JACK",
-                "JAM", "JET", "JUPITER", "KANGAROO", "KETCHUP", "KEY", "KID", "KING", "KIWI", "KNIFE",
-                "KNIGHT", "LAB", "LAP", "LASER", "LAWYER", "LEAD", "LEMON", "LEPRECHAUN", "LIFE", "LIGHT",
-                "LIMOUSINE", "LINE", "LINK", "LION", "LITTER", "LOCH NESS", "LOCK", "LOG", "LONDON", "LUCK",
-                "MAIL", "MAMMOTH", "MAPLE", "MARBLE", "MARCH", "MASS", "MATCH", "MERCURY", "MEXICO",
-                "MICROSCOPE", "MILLIONAIRE", "MINE", "MINT", "MISSILE", "MODEL", "MOLE", "MOON", "MOSCOW",
-                "MOUNT", "MOUSE", "MOUTH", "MUG", "NAIL", "NEEDLE", "NET", "NEW YORK", "NIGHT", "NINJA",
-                "NOTE", "NOVEL", "NURSE", "NUT", "OCTOPUS", "OIL", "OLIVE", "OLYMPUS", "OPERA", "ORANGE",
-                "ORGAN", "PALM", "PAN", "PANTS", "PAPER", "PARACHUTE", "PARK", "PART", "PASS", "PASTE",
-                "PENGUIN", "PHOENIX", "PIANO", "PIE", "PILOT", "PIN", "PIPE", "PIRATE", "PISTOL", "PIT",
-                "PITCH", "PLANE", "PLASTIC", "PLATE", "PLATYPUS", "PLAY", "PLOT", "POINT", "POISON",
-                "POLE", "POLICE", "POOL", "PORT", "POST", "POUND", "PRESS", "PRINCESS", "PUMPKIN", "PUPIL",
-                "PYRAMID", "QUEEN", "RABBIT", "RACKET", "RAY", "REVOLUTION", "RING", "ROBIN", "ROBOT",
-                "ROCK", "ROME", "ROOT", "ROSE", "ROULETTE", "ROUND", "ROW", "RULER", "SATELLITE", "SATURN",
-                "SCALE", "SCHOOL", "SCIENTIST", "SCORPION", "SCREEN", "SCUBA DIVER", "SEAL", "SERVER",
-                "SHADOW", "SHAKESPEARE", "SHARK", "SHIP", "SHOE", "SHOP", "SHOT", "SINK", "SKYSCRAPER",
-                "SLIP", "SLUG", "SMUGGLER", "SNOW", "SNOWMAN", "SOCK", "SOLDIER", "SOUL", "SOUND", "SPACE",
-                "SPELL", "SPIDER", "SPIKE", "SPINE", "SPOT", "SPRING", "SPY", "SQUARE", "STADIUM", "STAFF",
-                "STAR", "STATE", "STICK", "STOCK", "STRAW", "STREAM", "STRIKE", "STRING", "SUB", "SUIT",
-                "SUPERHERO", "SWING", "SWITCH", "TABLE", "TABLET", "TAG", "TAIL", "TAP", "TEACHER",
-                "TELESCOPE", "TEMPLE", "THEATER", "THIEF", "THUMB", "TICK", "TIE", "TIME", "TOKYO",
-                "TOOTH", "TORCH", "TOWER", "TRACK", "TRAIN", "TRIANGLE", "TRIP", "TRUNK", "TUBE", "TURKEY",
-                "UNDERTAKER", "UNICORN", "VACUUM", "VAN", "VET", "WAKE", "WALL", "WAR", "WASHER",
-                "WASHINGTON", "WATCH", "WATER", "WAVE", "WEB", "WELL", "WHALE", "WHIP", "WIND", "WITCH",
-                "WORM", "YARD"
-            ]
+        words = self.config.word_list or _DEFAULT_WORDS
         
         size = self.config.board_size
         selected_words = random.sample(words, size)
         
         # Calculate card distribution
-        if size == 25:
-            red_count, blue_count, assassin_count = 9, 8, 1
-        elif size == 36:
-            red_count, blue_count, assassin_count = 12, 11, 2
-        elif size == 49:
-            red_count, blue_count, assassin_count = 17, 16, 2
-        elif size == 64:
-            red_count, blue_count, assassin_count = 20, 19, 3
+        if size in _DISTRIBUTIONS:
+            red_count, blue_count, assassin_count = _DISTRIBUTIONS[size]
         else:
             # Safe default fallback for any other sizes if ever allowed
             red_count = (size // 3) + 1
@@ -164,6 +386,27 @@ class CodenamesGame:
         random.shuffle(types)
         
         self.cards = [CardState(word=w, type=t) for w, t in zip(selected_words, types)]
+        # Index cards by word and keep per-type unrevealed counts so moves stay O(1)
+        self._word_to_card: Dict[str, CardState] = {c.word: c for c in self.cards}
+        self._card_counts: Dict[CardType, int] = {
+            CardType.RED: red_count,
+            CardType.BLUE: blue_count,
+            CardType.NEUTRAL: neutral_count,
+            CardType.ASSASSIN: assassin_count
+        }
+        self._remaining: Dict[CardType, int] = dict(self._card_counts)
+        # Client-facing state as plain data. Card entries are flipped in place on
+        # reveal and the lists are shared with the game, so serving it is cheap
+        self._snapshot_cards = {c.word: {"word": c.word, "type": c.type.value, "revealed": False} for c in self.cards}
+        self._snapshot = {
+            "id": self.id,
+            "cards": list(self._snapshot_cards.values()),
+            "players": self.config.players,
+            "llm_model": self.config.llm_model,
+            "log": self.log,
+            "clue_history": self.clue_history,
+            "reasoning_log": self.reasoning_log
+        }
         self.log.append("Game initialized. Team RED starts.")
 
     def give_clue(self, team: Team, word: str, number: int):
@@ -172,23 +415,18 @@ class CodenamesGame:
         if team != self.current_turn:
             raise ValueError(f"Invalid Turn: It is {self.current_turn}'s turn, but {team} tried to move.")
         
-        # Basic validation
-        clue_upper = word.upper()
-        if any(c.word.upper() == clue_upper and not c.revealed for c in self.cards):
-             raise ValueError("Clue cannot be a word currently on the board!")
-        
-        # Check that clue doesn't contain a board word as a substring (or vice versa)
-        for c in self.cards:
-            if c.revealed:
-                continue
-            board_word = c.word.upper()
-            # Clue contains board word as substring (e.g., "PINEAPPLE" contains "APPLE")
-            if board_word in clue_upper and board_word != clue_upper:
-                raise ValueError(f"Clue '{word}' cannot contain the board word '{c.word}' as a substring!")
-            # Board word contains clue as substring (e.g., "APPLE" is in "PINEAPPLE")
-            if clue_upper in board_word and clue_upper != board_word:
-                raise ValueError(f"Clue '{word}' cannot be a part of the board word '{c.word}'!")
-
+        # Basic validation: clue can't be an unrevealed board word, contain one as a
+        # substring (e.g. "PINEAPPLE" for "APPLE"), or be part of one
+        if self._clue_validator is None:
+            self._clue_validator = ClueValidator([c.word for c in self.cards if not c.revealed])
+        conflict = self._clue_validator.conflict(word.upper())
+        if conflict:
+            kind, board_word = conflict
+            if kind == "on_board":
+                raise ValueError("Clue cannot be a word currently on the board!")
+            if kind == "contains":
+                raise ValueError(f"Clue '{word}' cannot contain the board word '{board_word}' as a substring!")
+            raise ValueError(f"Clue '{word}' cannot be a part of the board word '{board_word}'!")
 
         self.last_clue = (word, number)
         # Using 0 or -1 for unlimited? Standard rules say number + 1 guesses allowed.
@@ -206,6 +444,8 @@ class CodenamesGame:
             "number": number,
             "guesses": []
         })
+        self._dirty = True
+        self._invalidate_state()
 
         
         # Switch phase
@@ -218,19 +458,27 @@ class CodenamesGame:
         self.save_history()
 
 
+    def get_card(self, word: str) -> Optional[CardState]:
+        return self._word_to_card.get(word)
+
     def guess_card(self, team: Team, word: str):
         if self.phase not in [GamePhase.RED_GUESSER, GamePhase.BLUE_GUESSER]:
             raise ValueError(f"Invalid Move: It is currently {self.phase}. Only Guessers can move now.")
         if team != self.current_turn:
             raise ValueError(f"Invalid Turn: It is {self.current_turn}'s turn, but {team} tried to move.")
         
-        card = next((c for c in self.cards if c.word == word), None)
+        card = self._word_to_card.get(word)
         if not card:
             raise ValueError("Card not found")
         if card.revealed:
             raise ValueError("Card already revealed")
 
         card.revealed = True
+        self._snapshot_cards[word]["revealed"] = True
+        self._remaining[card.type] -= 1
+        self._clue_validator = None
+        self._dirty = True
+        self._invalidate_state()
         log_msg = f"{team.value} guesses {word}..."
         self.turn_count += 1
 
@@ -295,6 +543,7 @@ class CodenamesGame:
 
 
     def _end_turn(self):
+        self._invalidate_state()
         self.turn_count += 1
         self.last_clue = None
         self.remaining_guesses = 0
@@ -306,60 +555,109 @@ class CodenamesGame:
             self.phase = GamePhase.RED_SPYMASTER
 
     def _check_win(self) -> bool:
-        red_cards_left = sum(1 for c in self.cards if c.type == CardType.RED and not c.revealed)
-        blue_cards_left = sum(1 for c in self.cards if c.type == CardType.BLUE and not c.revealed)
-        
-        if red_cards_left == 0:
+        if self._remaining[CardType.RED] == 0:
             self.winner = Team.RED
             self.log.append("Team RED wins!")
             self.save_history() # Auto-save
             return True
-        elif blue_cards_left == 0:
+        elif self._remaining[CardType.BLUE] == 0:
             self.winner = Team.BLUE
             self.log.append("Team BLUE wins!")
             self.save_history() # Auto-save
             return True
         return False
 
+    def add_reasoning(self, entry: dict):
+        self.reasoning_log.append(entry)
+        self._invalidate_state()
+
+    def _invalidate_state(self):
+        self._state_cache = None
+        self._state_dict_cache = None
+
+    def _score(self) -> Dict[Team, int]:
+        return {
+            Team.RED: self._card_counts[CardType.RED] - self._remaining[CardType.RED],
+            Team.BLUE: self._card_counts[CardType.BLUE] - self._remaining[CardType.BLUE]
+        }
+
+    def _refresh_views(self):
+        if self._dirty:
+            self._board_str_spymaster = format_board(self.cards, is_spymaster=True)
+            self._board_str_public = format_board(self.cards, is_spymaster=False)
+            self._history_str = format_clue_history(self.clue_history)
+            self._unrevealed_words = group_unrevealed_words(self.cards)
+            self._dirty = False
+
     def get_state(self):
-        return GameState(
+        if self._state_cache is not None:
+            return self._state_cache
+        self._refresh_views()
+        self._state_cache = GameState(
             id=self.id,
             cards=self.cards,
             current_turn=self.current_turn,
             phase=self.phase,
             players=self.config.players,
             llm_model=self.config.llm_model,
-            score={
-
-                Team.RED: sum(1 for c in self.cards if c.type == CardType.RED and c.revealed),
-                Team.BLUE: sum(1 for c in self.cards if c.type == CardType.BLUE and c.revealed)
-            },
+            score=self._score(),
             winner=self.winner,
             last_clue=self.last_clue,
             remaining_guesses=self.remaining_guesses,
             turn_count=self.turn_count,
             log=self.log,
             clue_history=self.clue_history,
-            reasoning_log=self.reasoning_log
+            reasoning_log=self.reasoning_log,
+            board_view_spymaster=self._board_str_spymaster,
+            board_view_public=self._board_str_public,
+            history_view=self._history_str,
+            unrevealed_words=self._unrevealed_words
         )
+        return self._state_cache
+
+    def get_state_dict(self) -> dict:
+        """
+        The same data as get_state(), as a plain JSON-ready dict, without
+        rebuilding or validating a GameState. Prefer this at the API boundary.
+        The dict is reused until the next move, so treat it as read-only.
+        """
+        if self._state_dict_cache is not None:
+            return self._state_dict_cache
+        state = dict(self._snapshot)
+        state.update(
+            current_turn=self.current_turn.value,
+            phase=self.phase.value,
+            score={team.value: found for team, found in self._score().items()},
+            winner=self.winner.value if self.winner else None,
+            last_clue=self.last_clue,
+            remaining_guesses=self.remaining_guesses,
+            turn_count=self.turn_count
+        )
+        self._state_dict_cache = state
+        return state
 
-        
     def save_history(self):
         filename = f"history/game_history_{self.id}.json"
+        # Materialize the snapshot now; the write happens later on the writer task
         data = {
             "game_id": self.id,
             "cards": [{"word": c.word, "type": c.type.value, "revealed": c.revealed} for c in self.cards],
             "winner": self.winner,
-            "log": self.log,
-            "reasoning_log": self.reasoning_log,
-            "final_score": {
-                Team.RED: sum(1 for c in self.cards if c.type == CardType.RED and c.revealed),
-                Team.BLUE: sum(1 for c in self.cards if c.type == CardType.BLUE and c.revealed)
-            }
+            "log": list(self.log),
+            "reasoning_log": list(self.reasoning_log),
+            "final_score": self._score()
         }
 
-        with open(filename, "w") as f:
-            json.dump(data, f, indent=2, default=str)
+        history_writer.submit(filename, data)
+        return filename
+
+    async def save_history_async(self):
+        """
+        Like save_history(), but waits until the file is on disk. Goes through the
+        writer queue so it can't race an earlier, still-pending snapshot.
+        """
+        filename = self.save_history()
+        await history_writer.flush()
         return filename
 
 # Helper extension for opponents
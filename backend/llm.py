@@ -1,13 +1,35 @@
 import os
+import re
 import json
-from typing import List, Optional
+import asyncio
+from typing import Callable, Dict, Optional, Tuple
 from dotenv import load_dotenv
 import openai
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 from google import genai
 
+from cache import CacheService
+
 load_dotenv()
 
+# One cache for every LLMService in the process, so services on different
+# models share entries and a single writer owns the cache file
+llm_cache = CacheService(path=os.getenv("LLM_CACHE_PATH"))
+
+# Small, fast model per provider for cheap auxiliary calls (e.g. guess verification)
+SMALL_MODELS = {
+    "openai": "gpt-4o-mini",
+    "anthropic": "claude-3-haiku-20240307",
+    "gemini": "gemini-2.0-flash-lite"
+}
+
+# Matches a complete "word" string value in a partially streamed JSON object
+_WORD_FIELD = re.compile(r'"word"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+class WordRejected(ValueError):
+    """check_word refused a streamed "word"; an expected early rejection, not an LLM failure."""
+
+
 class LLMService:
     def __init__(self, provider: str = "openai", model: str = None):
         self.provider = provider
@@ -17,7 +39,8 @@ class LLMService:
             self.client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
             self.default_model = "gpt-4o"
         elif provider == "anthropic":
-            self.client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+            # One shared async client keeps its HTTP connection pool across calls
+            self.client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
             self.default_model = "claude-3-5-sonnet-20240620"
         elif provider == "gemini":
             self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
@@ -25,8 +48,46 @@ class LLMService:
         else:
             raise ValueError(f"Unsupported provider: {provider}")
 
-    async def generate_response(self, system_prompt: str, user_prompt: str) -> dict:
+        self.cache = llm_cache
+
+    async def generate_response(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        use_cache: bool = True,
+        check_word: Optional[Callable[[str], None]] = None,
+        schema: Optional[Dict] = None,
+        schema_name: str = "response"
+    ) -> dict:
+        """
+        check_word, if given, is called with the "word" field as soon as it has
+        streamed in; raising from it aborts the response early (OpenAI only).
+        schema, if given, is a JSON schema the provider is asked to enforce on
+        the output (structured outputs / tool input).
+        """
         model = self.model or self.default_model
+        key = CacheService.make_key(self.provider, model, system_prompt, user_prompt)
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                print(f"--- LLM CACHE HIT: Provider={self.provider}, Model={model} ---")
+                return cached
+
+        response = await self._request(model, system_prompt, user_prompt, check_word, schema, schema_name)
+        if response:
+            self.cache.put(key, response)
+            self.cache.schedule_save()
+        return response
+
+    async def _request(
+        self,
+        model: str,
+        system_prompt: str,
+        user_prompt: str,
+        check_word: Optional[Callable[[str], None]] = None,
+        schema: Optional[Dict] = None,
+        schema_name: str = "response"
+    ) -> dict:
         print(f"--- LLM REQUEST: Provider={self.provider}, Model={model} ---")
 
         
@@ -50,21 +111,39 @@ class LLMService:
                         {"role": "system", "content": system_prompt},
                         {"role": "user", "content": user_prompt}
                     ]
-                    response = await self.client.chat.completions.create(
+                    # Structured outputs constrain generation to the schema, so the
+                    # response always parses and has the fields we need
+                    if schema:
+                        response_format = {
+                            "type": "json_schema",
+                            "json_schema": {"name": schema_name, "schema": schema, "strict": True}
+                        }
+                    else:
+                        response_format = {"type": "json_object"}
+                    stream = await self.client.chat.completions.create(
                         model=model,
                         messages=messages,
-                        response_format={"type": "json_object"}
+                        response_format=response_format,
+                        stream=True
                     )
-                    return json.loads(response.choices[0].message.content)
+                    return await self._read_stream(stream, check_word)
 
             
             elif self.provider == "anthropic":
-                # Anthropic doesn't have an async client in the same way, but we'll use wraps or similar if needed.
-                # For simplicity in this scratchpad, we'll assume a standard call or use a thread pool if async is critical.
-                # Actually, anthropic has AsyncAnthropic.
-                from anthropic import AsyncAnthropic
-                async_client = AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
-                response = await async_client.messages.create(
+                if schema:
+                    # Forcing a tool call makes Claude return the arguments as
+                    # schema-checked input instead of free text
+                    response = await self.client.messages.create(
+                        model=model,
+                        max_tokens=1024,
+                        system=system_prompt,
+                        messages=[{"role": "user", "content": user_prompt}],
+                        tools=[{"name": schema_name, "input_schema": schema}],
+                        tool_choice={"type": "tool", "name": schema_name}
+                    )
+                    return next((block.input for block in response.content if block.type == "tool_use"), {})
+
+                response = await self.client.messages.create(
                     model=model,
                     max_tokens=1024,
                     system=system_prompt,
@@ -75,26 +154,47 @@ class LLMService:
                 return self._extract_json(content)
 
             elif self.provider == "gemini":
-                # Using new google-genai SDK
-                # Note: google-genai's client.models.generate_content is not natively async in the current beta? 
-                # Let's check. Actually, it uses a sync client usually unless specified.
-                # For now, we'll use run_in_executor to keep it non-blocking if needed, or check if they added async.
-                # The latest google-genai has an 'aio' property or similar.
-                
-                response = self.client.models.generate_content(
+                # Using new google-genai SDK; its async surface lives under client.aio,
+                # so the call doesn't block the event loop for other games/agents
+                config = {
+                    'system_instruction': system_prompt,
+                    'response_mime_type': 'application/json',
+                }
+                if schema:
+                    config['response_json_schema'] = schema
+                response = await self.client.aio.models.generate_content(
                     model=model,
-                    config={
-                        'system_instruction': system_prompt,
-                        'response_mime_type': 'application/json',
-                    },
+                    config=config,
                     contents=user_prompt
                 )
                 return json.loads(response.text)
                 
+        except WordRejected:
+            raise
         except Exception as e:
             print(f"LLM Error ({self.provider}): {e}")
             raise e
 
+    async def _read_stream(self, stream, check_word: Optional[Callable[[str], None]] = None) -> dict:
+        """Accumulate a streamed JSON completion, checking "word" as soon as it arrives."""
+        parts = []
+        checked = check_word is None
+        async for chunk in stream:
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            parts.append(chunk.choices[0].delta.content)
+            if not checked:
+                match = _WORD_FIELD.search("".join(parts))
+                if match:
+                    checked = True
+                    try:
+                        check_word(json.loads(f'"{match.group(1)}"'))
+                    except Exception as e:
+                        # Don't pay for the rest of a response we're going to reject
+                        await stream.close()
+                        raise WordRejected(str(e)) from e
+        return json.loads("".join(parts))
+
     def _extract_json(self, text: str) -> dict:
         try:
             # Simple extraction in case LLM wraps in markdown
@@ -105,3 +205,30 @@ class LLMService:
             return json.loads(text.strip())
         except:
             return {}
+
+
+class LLMBatcher:
+    """
+    Shared entry point for one (provider, model). Every agent on that model goes
+    through the same LLMService, so they share its client connection pool and the
+    response cache. Requests start as soon as they are submitted and run
+    concurrently; they are not merged into a provider-side batch call.
+    """
+
+    def __init__(self, service: LLMService):
+        self.service = service
+
+    async def submit(self, system_prompt: str, user_prompt: str, **options) -> dict:
+        """Options are passed through to LLMService.generate_response."""
+        return await self.service.generate_response(system_prompt, user_prompt, **options)
+
+
+# Shared batchers, one per (provider, model), so agents reuse one service and client
+_batchers: Dict[Tuple[str, Optional[str]], LLMBatcher] = {}
+
+
+def get_batcher(provider: str = "openai", model: str = None) -> LLMBatcher:
+    key = (provider, model)
+    if key not in _batchers:
+        _batchers[key] = LLMBatcher(LLMService(provider=provider, model=model))
+    return _batchers[key]
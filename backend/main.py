@@ -1,18 +1,37 @@
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, WebSocket, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict, defaultdict
 import uuid
-import json
+import time
+import datetime
+import traceback
 import asyncio
-
-from game_engine import CodenamesGame, GameConfig, Team, GamePhase, GameState
-from agents import SpymasterAgent, GuesserAgent
+import orjson
+import msgpack
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+from game_engine import CodenamesGame, GameConfig, Team, GamePhase, GameState, history_writer, HISTORY_INDEX, read_history_index, rebuild_history_index
+from agents import Agent, SpymasterAgent, GuesserAgent
+from llm import llm_cache
 import os
 
 ACCESS_TOKEN = os.getenv("ACCESS_TOKEN")
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    pruner = asyncio.create_task(_prune_loop())
+    yield
+    pruner.cancel()
+    # Don't drop history snapshots still queued for writing
+    await history_writer.flush()
+    await llm_cache.flush()
+
+# orjson encodes responses in C instead of walking them with jsonable_encoder + json
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -23,16 +42,98 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage
-games: Dict[str, CodenamesGame] = {}
+# In-memory storage, bounded so abandoned games don't pile up
+MAX_GAMES = 10_000
+GAME_TTL_SECONDS = 6 * 3600
+PRUNE_INTERVAL_SECONDS = 60
+
+class GameStore:
+    """LRU of live games that also expires games left untouched for `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._games: "OrderedDict[str, Tuple[CodenamesGame, float]]" = OrderedDict()
+
+    def __contains__(self, game_id: str) -> bool:
+        # Membership alone doesn't count as activity
+        return game_id in self._games
+
+    def get(self, game_id: str) -> Optional[CodenamesGame]:
+        """Look up a game and refresh its TTL."""
+        entry = self._games.get(game_id)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if now - entry[1] > self.ttl:
+            self._evict(game_id)
+            return None
+        self._games[game_id] = (entry[0], now)
+        self._games.move_to_end(game_id)
+        return entry[0]
+
+    def __setitem__(self, game_id: str, game: CodenamesGame):
+        self._games[game_id] = (game, time.monotonic())
+        self._games.move_to_end(game_id)
+        while len(self._games) > self.maxsize:
+            self._evict(next(iter(self._games)))
+
+    def prune(self):
+        # Entries are kept in access order, so expired ones sit at the front
+        cutoff = time.monotonic() - self.ttl
+        while self._games:
+            game_id, (_, touched) = next(iter(self._games.items()))
+            if touched > cutoff:
+                break
+            self._evict(game_id)
+
+    def _evict(self, game_id: str):
+        del self._games[game_id]
+        evict_agents(game_id)
+        game_locks.pop(game_id, None)
+
+games = GameStore(maxsize=MAX_GAMES, ttl=GAME_TTL_SECONDS)
+
+# Serializes moves per game so agent calls always see the state they will apply to
+game_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+# Agents reused across turns, keyed by (game_id, team, is_spymaster); LRU-bounded
+MAX_CACHED_AGENTS = 256
+_agent_cache: "OrderedDict[Tuple[str, Team, bool], Agent]" = OrderedDict()
+
+def get_agent(game: CodenamesGame, team: Team, is_spymaster: bool) -> Agent:
+    key = (game.id, team, is_spymaster)
+    agent = _agent_cache.get(key)
+    if agent is not None:
+        _agent_cache.move_to_end(key)
+        return agent
+
+    if is_spymaster:
+        agent = SpymasterAgent(team, llm_model=game.config.llm_model)
+    else:
+        agent = GuesserAgent(team, llm_model=game.config.llm_model)
+    _agent_cache[key] = agent
+    if len(_agent_cache) > MAX_CACHED_AGENTS:
+        _agent_cache.popitem(last=False)
+    return agent
 
-from fastapi import Header
+def evict_agents(game_id: str):
+    for key in [k for k in _agent_cache if k[0] == game_id]:
+        del _agent_cache[key]
 
 async def verify_token(x_access_token: Optional[str] = Header(None)):
     if ACCESS_TOKEN and x_access_token != ACCESS_TOKEN:
         raise HTTPException(status_code=401, detail="Invalid or missing Access Token")
     return x_access_token
 
+# Websocket broadcasts are binary frames led by a one-byte format tag, so the
+# wire format can change without breaking clients that check it. REST stays JSON
+WS_FORMAT_JSON = b"\x00"
+WS_FORMAT_MSGPACK = b"\x01"
+
+def encode_ws_message(message: dict) -> bytes:
+    return WS_FORMAT_MSGPACK + msgpack.packb(message, use_bin_type=True)
+
 # Connection manager for WebSockets
 class ConnectionManager:
     def __init__(self):
@@ -46,21 +147,54 @@ class ConnectionManager:
         self.active_connections[game_id].append(websocket)
 
     def disconnect(self, websocket: WebSocket, game_id: str):
-        if game_id in self.active_connections:
+        if game_id in self.active_connections and websocket in self.active_connections[game_id]:
             self.active_connections[game_id].remove(websocket)
             if not self.active_connections[game_id]:
                 del self.active_connections[game_id]
 
+    def has_subscribers(self, game_id: str) -> bool:
+        return bool(self.active_connections.get(game_id))
+
     async def broadcast(self, game_id: str, message: dict):
-        if game_id in self.active_connections:
-            for connection in self.active_connections[game_id]:
-                try:
-                    await connection.send_json(message)
-                except Exception:
-                    pass # Handle closed connections gracefully-ish
+        # Encode once for every viewer, and not at all if nobody is watching
+        if self.has_subscribers(game_id):
+            await self.broadcast_bytes(game_id, encode_ws_message(message))
+
+    async def broadcast_bytes(self, game_id: str, payload: bytes):
+        if self.has_subscribers(game_id):
+            # Send the same pre-encoded bytes to every viewer concurrently
+            connections = list(self.active_connections[game_id])
+            results = await asyncio.gather(
+                *(connection.send_bytes(payload) for connection in connections),
+                return_exceptions=True
+            )
+            # Drop connections whose send failed (closed sockets)
+            for connection, result in zip(connections, results):
+                if isinstance(result, Exception):
+                    self.disconnect(connection, game_id)
+
+    async def close_orphans(self):
+        """Close sockets still watching games that have been evicted."""
+        for game_id in [g for g in self.active_connections if g not in games]:
+            # The last viewer may have disconnected while we awaited the previous game
+            connections = self.active_connections.pop(game_id, [])
+            await asyncio.gather(
+                *(connection.close() for connection in connections),
+                return_exceptions=True
+            )
 
 manager = ConnectionManager()
 
+async def _prune_loop():
+    while True:
+        await asyncio.sleep(PRUNE_INTERVAL_SECONDS)
+        # A failed pass must not kill the task, or nothing is ever pruned again
+        try:
+            games.prune()
+            await manager.close_orphans()
+        except Exception:
+            traceback.print_exc()
+
 # --- API Data Models ---
 
 class CreateGameRequest(BaseModel):
@@ -84,7 +218,6 @@ class ActionRequest(BaseModel):
 
 # --- Endpoints ---
 
-from fastapi import Depends
 
 @app.post("/api/game/create")
 async def create_game(request: CreateGameRequest, token: str = Depends(verify_token)):
@@ -102,134 +235,122 @@ async def create_game(request: CreateGameRequest, token: str = Depends(verify_to
 
 @app.get("/api/game/{game_id}")
 async def get_game_state(game_id: str):
-    if game_id not in games:
+    game = games.get(game_id)
+    if game is None:
         raise HTTPException(status_code=404, detail="Game not found")
-    return games[game_id].get_state()
+    return ORJSONResponse(game.get_state_dict())
 
 @app.post("/api/game/{game_id}/move")
 async def make_move(game_id: str, list_request: ActionRequest):
-    if game_id not in games:
+    game = games.get(game_id)
+    if game is None:
         raise HTTPException(status_code=404, detail="Game not found")
     
-    game = games[game_id]
-    
-    try:
-        if list_request.action_type == "CLUE":
-            # Infer team from current turn
-            game.give_clue(game.current_turn, list_request.payload['word'], list_request.payload['number'])
-        elif list_request.action_type == "GUESS":
-            game.guess_card(game.current_turn, list_request.payload['word'])
-        elif list_request.action_type == "END_TURN":
-            game.end_turn_manually(game.current_turn)
+    async with game_locks[game_id]:
+        try:
+            if list_request.action_type == "CLUE":
+                # Infer team from current turn
+                game.give_clue(game.current_turn, list_request.payload['word'], list_request.payload['number'])
+            elif list_request.action_type == "GUESS":
+                game.guess_card(game.current_turn, list_request.payload['word'])
+            elif list_request.action_type == "END_TURN":
+                game.end_turn_manually(game.current_turn)
+
+            if game.phase == GamePhase.GAME_OVER:
+                evict_agents(game_id)
+                
+            # Broadcast update
+            state = game.get_state_dict()
+            await manager.broadcast(game_id, {"type": "STATE_UPDATE", "state": state})
             
-        # Broadcast update
-        await manager.broadcast(game_id, {"type": "STATE_UPDATE", "state": game.get_state().dict()})
-        
-        return {"status": "success", "state": game.get_state()}
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+            return ORJSONResponse({"status": "success", "state": state})
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/api/game/{game_id}/agent-move")
 async def trigger_agent_move(game_id: str, expected_turn_count: Optional[int] = None, token: str = Depends(verify_token)):
-    if game_id not in games:
+    game = games.get(game_id)
+    if game is None:
         raise HTTPException(status_code=404, detail="Game not found")
     
-    game = games[game_id]
-    
-    # Validate turn count from client to prevent stale requests
-    if expected_turn_count is not None and expected_turn_count != game.turn_count:
-        print(f"STALE REQUEST: Client expected turn {expected_turn_count} but current is {game.turn_count}. Ignoring.")
-        return {"status": "ignored", "reason": f"Stale request. Expected turn {expected_turn_count}, current is {game.turn_count}"}
-    
-    # Determine which agent to call based on phase
-    current_team = game.current_turn
-    is_spymaster = game.phase in [GamePhase.RED_SPYMASTER, GamePhase.BLUE_SPYMASTER]
-    
-    agent = None
-    if is_spymaster:
-        agent = SpymasterAgent(current_team, llm_model=game.config.llm_model)
-    else:
-        agent = GuesserAgent(current_team, llm_model=game.config.llm_model)
+    # Moves on this game queue up here, so once we hold the lock the turn check
+    # below stays true until our move is applied and no LLM call is wasted
+    async with game_locks[game_id]:
+        # Validate turn count from client to prevent stale requests
+        if expected_turn_count is not None and expected_turn_count != game.turn_count:
+            print(f"STALE REQUEST: Client expected turn {expected_turn_count} but current is {game.turn_count}. Ignoring.")
+            return {"status": "ignored", "reason": f"Stale request. Expected turn {expected_turn_count}, current is {game.turn_count}"}
         
-    # Capture state ID to prevent race conditions (server-side double check)
-    start_turn_count = game.turn_count
-
-    
-    try:
-        move = await agent.get_move(game.get_state())
-        
-        # Verify race condition
-        if game.turn_count != start_turn_count:
-            print(f"RACE CONDITION DETECTED: Agent started at turn {start_turn_count} but now it is {game.turn_count}. Discarding move.")
-            return {"status": "ignored", "reason": "State changed during processing"}
-        
-        # Log reasoning
-        import datetime
-        timestamp = datetime.datetime.now().isoformat()
-        
-        reasoning_entry = {
-            "role": f"{current_team.value} {'SPYMASTER' if is_spymaster else 'GUESSER'}",
-            "action": f"Clue: {move.get('word')} {move.get('number')}" if is_spymaster else f"Guess Plan: {move.get('words')}",
-            "reasoning": move.get("reasoning") or f"Reasoning missing. Raw keys: {list(move.keys())}",
-            "timestamp": timestamp
-        }
-
-        game.reasoning_log.append(reasoning_entry)
+        # Determine which agent to call based on phase
+        current_team = game.current_turn
+        is_spymaster = game.phase in [GamePhase.RED_SPYMASTER, GamePhase.BLUE_SPYMASTER]
         
-        # Apply move
-        state_updates = []
-        if is_spymaster:
-            game.give_clue(current_team, move["word"], move["number"])
-            state_updates.append(f"Clue: {move['word']} {move['number']}")
+        agent = get_agent(game, current_team, is_spymaster)
         
-        # For Guesser, we simply return the "words" plan. 
-        # The frontend will execute them one by one to create the animation effect.
-                
-        # Broadcast update (mainly for Spymaster clue, or just log update)
-        await manager.broadcast(game_id, {"type": "STATE_UPDATE", "state": game.get_state().dict()})
-        
-        return {"status": "success", "move": move, "state": game.get_state(), "updates": state_updates}
+        try:
+            move = await agent.get_move(game.get_state())
+            
+            # Log reasoning
+            timestamp = datetime.datetime.now().isoformat()
+            
+            reasoning_entry = {
+                "role": f"{current_team.value} {'SPYMASTER' if is_spymaster else 'GUESSER'}",
+                "action": f"Clue: {move.get('word')} {move.get('number')}" if is_spymaster else f"Guess Plan: {move.get('words')}",
+                "reasoning": move.get("reasoning") or f"Reasoning missing. Raw keys: {list(move.keys())}",
+                "timestamp": timestamp
+            }
+
+            game.add_reasoning(reasoning_entry)
+            
+            # Apply move
+            state_updates = []
+            if is_spymaster:
+                game.give_clue(current_team, move["word"], move["number"])
+                state_updates.append(f"Clue: {move['word']} {move['number']}")
+                if game.phase == GamePhase.GAME_OVER:
+                    evict_agents(game_id)
+            elif move.get("action") == "END_TURN":
+                # No guesses to animate (agent passed or the verifier dropped them all),
+                # so end the turn here; otherwise autoplay keeps re-asking the agent
+                game.end_turn_manually(current_team)
+                state_updates.append("End turn")
+            
+            # For Guesser, we simply return the "words" plan. 
+            # The frontend will execute them one by one to create the animation effect.
+                    
+            # Broadcast update (mainly for Spymaster clue, or just log update)
+            state = game.get_state_dict()
+            await manager.broadcast(game_id, {"type": "STATE_UPDATE", "state": state})
+            
+            return ORJSONResponse({"status": "success", "move": move, "state": state, "updates": state_updates})
 
 
 
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            traceback.print_exc()
+            raise HTTPException(status_code=400, detail=str(e))
 
 
 # --- History Replay Endpoints ---
 
+def _load_history(path) -> dict:
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+
 @app.get("/api/history/list")
 async def list_game_history():
     """List all saved game histories."""
-    import os
-    from pathlib import Path
-    
     history_dir = Path("history")
     if not history_dir.exists():
         return {"games": []}
     
-    games_list = []
-    for game_file in history_dir.glob("game_history_*.json"):
-        game_id = game_file.stem.replace("game_history_", "")
-        try:
-            with open(game_file, 'r') as f:
-                data = json.load(f)
-            games_list.append({
-                "game_id": game_id,
-                "winner": data.get("winner"),
-                "final_score": data.get("final_score"),
-                "has_cards": "cards" in data
-            })
-        except (json.JSONDecodeError, IOError):
-            games_list.append({
-                "game_id": game_id,
-                "winner": None,
-                "final_score": None,
-                "has_cards": False,
-                "error": "corrupted"
-            })
+    # Saves keep a small summary index, so listing doesn't parse every history file
+    if os.path.exists(HISTORY_INDEX):
+        games_list = await asyncio.to_thread(read_history_index)
+    else:
+        # No index yet: scan the files once (off the event loop) and write it
+        games_list = await asyncio.to_thread(rebuild_history_index, history_dir)
     
     return {"games": games_list}
 
@@ -237,17 +358,14 @@ async def list_game_history():
 @app.get("/api/history/{game_id}")
 async def get_game_history(game_id: str):
     """Get a specific game's history for replay."""
-    import os
-    
     history_path = f"history/game_history_{game_id}.json"
     if not os.path.exists(history_path):
         raise HTTPException(status_code=404, detail="Game history not found")
     
     try:
-        with open(history_path, 'r') as f:
-            history = json.load(f)
-        return history
-    except json.JSONDecodeError:
+        history = await asyncio.to_thread(_load_history, history_path)
+        return ORJSONResponse(history)
+    except orjson.JSONDecodeError:
         raise HTTPException(status_code=500, detail="Corrupted game history")
 
 
@@ -255,12 +373,20 @@ async def get_game_history(game_id: str):
 async def websocket_endpoint(websocket: WebSocket, game_id: str):
     await manager.connect(websocket, game_id)
     try:
+        # Liveness comes from uvicorn's protocol-level ping/pong; we only wait for
+        # the disconnect and drop anything clients send without decoding it
         while True:
-            # Just keep connection alive, maybe handle chat later
-            await websocket.receive_text()
-    except WebSocketDisconnect:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    finally:
         manager.disconnect(websocket, game_id)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # uvloop/httptools when installed (C event loop and HTTP parser). Keep a single
+    # worker: games live in this process's memory
+    uvicorn.run(
+        app, host="0.0.0.0", port=8000, loop="auto", http="auto", workers=1,
+        ws_ping_interval=20, ws_ping_timeout=20
+    )
@@ -11,17 +11,21 @@ Usage:
 
 import asyncio
 import argparse
+import datetime
 import json
 import os
 import sys
 import time
+import uuid
+from collections import Counter
 from pathlib import Path
 
 # Add parent to path for imports
 sys.path.insert(0, str(Path(__file__).parent))
 
-from game_engine import CodenamesGame, GameConfig, Team, GamePhase
+from game_engine import CodenamesGame, GameConfig, Team, GamePhase, CardType, scan_history_files, history_game_id
 from agents import SpymasterAgent, GuesserAgent
+from llm import llm_cache
 
 # ANSI colors for terminal output
 class Colors:
@@ -34,42 +38,59 @@ class Colors:
     RESET = '\033[0m'
 
 
+# Color prefix per card type, and the fixed pieces of the board/score output
+TYPE_COLORS = {
+    "RED": Colors.RED,
+    "BLUE": Colors.BLUE,
+    "ASSASSIN": Colors.GRAY + Colors.BOLD,
+    "NEUTRAL": Colors.YELLOW
+}
+RULE = "=" * 60
+BOARD_HEADER = f"\n{RULE}\n{Colors.BOLD}BOARD{Colors.RESET}\n{RULE}\n"
+REPLAY_BOARD_HEADER = f"\n{RULE}\n{Colors.BOLD}INITIAL BOARD{Colors.RESET}\n{RULE}\n"
+RED_SCORE = f"{Colors.RED}RED: "
+BLUE_SCORE = f"{Colors.RESET}  |  {Colors.BLUE}BLUE: "
+
+# Per-guess output templates with their colors baked in; fill with % word
+CORRECT_FMT = f"{Colors.GREEN}✓ %s - Correct!{Colors.RESET}"
+ASSASSIN_FMT = f"{Colors.GRAY}{Colors.BOLD}☠ %s - ASSASSIN! Game Over.{Colors.RESET}"
+NEUTRAL_FMT = f"{Colors.YELLOW}○ %s - Neutral. Turn ends.{Colors.RESET}"
+OPPONENT_FMT = {
+    "RED": f"{Colors.RED}✗ %s - Opponent's card! Turn ends.{Colors.RESET}",
+    "BLUE": f"{Colors.BLUE}✗ %s - Opponent's card! Turn ends.{Colors.RESET}"
+}
+GUESS_ERROR_FMT = f"{Colors.RED}Error guessing %s: %s{Colors.RESET}"
+ENDING_TURN = f"{Colors.GRAY}Ending turn.{Colors.RESET}"
+
+
 def print_board(game: CodenamesGame, reveal_all: bool = False):
     """Print the game board in a nice grid format."""
-    print("\n" + "="*60)
-    print(f"{Colors.BOLD}BOARD{Colors.RESET}")
-    print("="*60)
-    
+    # Build the whole grid and write it in one go
+    parts = [BOARD_HEADER]
     for i, card in enumerate(game.cards):
         if card.revealed or reveal_all:
-            if card.type.value == "RED":
-                color = Colors.RED
-            elif card.type.value == "BLUE":
-                color = Colors.BLUE
-            elif card.type.value == "ASSASSIN":
-                color = Colors.GRAY + Colors.BOLD
-            else:
-                color = Colors.YELLOW
+            color = TYPE_COLORS[card.type.value]
             status = "✓" if card.revealed else " "
         else:
             color = Colors.RESET
             status = " "
         
-        word = f"{card.word:12}"
-        print(f"{color}{word}{Colors.RESET}[{status}]", end="  ")
+        parts.append(f"{color}{card.word:12}{Colors.RESET}[{status}]  ")
         if (i + 1) % 5 == 0:
-            print()
-    print()
+            parts.append("\n")
+    parts.append("\n")
+    sys.stdout.write("".join(parts))
 
 
 def print_scores(game: CodenamesGame):
     """Print current scores."""
-    red_total = sum(1 for c in game.cards if c.type.value == "RED")
-    blue_total = sum(1 for c in game.cards if c.type.value == "BLUE")
-    red_found = sum(1 for c in game.cards if c.type.value == "RED" and c.revealed)
-    blue_found = sum(1 for c in game.cards if c.type.value == "BLUE" and c.revealed)
+    counts = Counter((c.type, c.revealed) for c in game.cards)
+    red_found = counts[CardType.RED, True]
+    blue_found = counts[CardType.BLUE, True]
+    red_total = red_found + counts[CardType.RED, False]
+    blue_total = blue_found + counts[CardType.BLUE, False]
     
-    print(f"{Colors.RED}RED: {red_found}/{red_total}{Colors.RESET}  |  {Colors.BLUE}BLUE: {blue_found}/{blue_total}{Colors.RESET}")
+    sys.stdout.write(f"{RED_SCORE}{red_found}/{red_total}{BLUE_SCORE}{blue_found}/{blue_total}{Colors.RESET}\n")
 
 
 async def run_game(delay: float = 1.0):
@@ -86,7 +107,6 @@ async def run_game(delay: float = 1.0):
         "BLUE_GUESSER": "agent"
     })
     
-    import uuid
     game_id = str(uuid.uuid4())[:8]
     game = CodenamesGame(id=game_id, config=config)
     
@@ -94,8 +114,17 @@ async def run_game(delay: float = 1.0):
     print_board(game, reveal_all=True)  # Show full board at start (spymaster view)
     print_scores(game)
     
+    # One agent per (team, role), reused every turn
+    agents = {
+        (Team.RED, True): SpymasterAgent(Team.RED),
+        (Team.RED, False): GuesserAgent(Team.RED),
+        (Team.BLUE, True): SpymasterAgent(Team.BLUE),
+        (Team.BLUE, False): GuesserAgent(Team.BLUE)
+    }
+    
     turn_count = 0
     max_turns = 50  # Safety limit
+    pause = None  # Readability delay, overlapped with the next agent's thinking
     
     while game.phase != GamePhase.GAME_OVER and turn_count < max_turns:
         turn_count += 1
@@ -107,18 +136,15 @@ async def run_game(delay: float = 1.0):
         
         print(f"\n{team_color}{Colors.BOLD}--- Turn {turn_count}: {current_team.value} {role} ---{Colors.RESET}")
         
-        # Create agent
-        if is_spymaster:
-            agent = SpymasterAgent(current_team)
-        else:
-            agent = GuesserAgent(current_team)
+        agent = agents[(current_team, is_spymaster)]
         
         # Get move
         print(f"{Colors.GRAY}Agent thinking...{Colors.RESET}")
         move = await agent.get_move(game.get_state())
+        if pause is not None:
+            await pause
         
         # Log reasoning
-        import datetime
         timestamp = datetime.datetime.now().isoformat()
         reasoning_entry = {
             "role": f"{current_team.value} {role}",
@@ -126,7 +152,7 @@ async def run_game(delay: float = 1.0):
             "reasoning": move.get("reasoning", ""),
             "timestamp": timestamp
         }
-        game.reasoning_log.append(reasoning_entry)
+        game.add_reasoning(reasoning_entry)
         
         # Apply move
         if is_spymaster:
@@ -147,32 +173,33 @@ async def run_game(delay: float = 1.0):
             
             if "END_TURN" in words or not words:
                 game.end_turn_manually(current_team)
-                print(f"{Colors.GRAY}Ending turn.{Colors.RESET}")
+                print(ENDING_TURN)
             else:
                 for word in words:
                     if word == "END_TURN":
                         game.end_turn_manually(current_team)
-                        print(f"{Colors.GRAY}Ending turn.{Colors.RESET}")
+                        print(ENDING_TURN)
                         break
                     
                     try:
                         turn_ended = game.guess_card(current_team, word)
-                        card = next(c for c in game.cards if c.word == word)
+                        card = game.get_card(word)
                         
-                        if card.type.value == current_team.value:
-                            print(f"{Colors.GREEN}✓ {word} - Correct!{Colors.RESET}")
-                        elif card.type.value == "ASSASSIN":
-                            print(f"{Colors.GRAY}{Colors.BOLD}☠ {word} - ASSASSIN! Game Over.{Colors.RESET}")
-                        elif card.type.value == "NEUTRAL":
-                            print(f"{Colors.YELLOW}○ {word} - Neutral. Turn ends.{Colors.RESET}")
+                        card_type = card.type.value
+                        if card_type == current_team.value:
+                            print(CORRECT_FMT % word)
+                        elif card_type == "ASSASSIN":
+                            print(ASSASSIN_FMT % word)
+                        elif card_type == "NEUTRAL":
+                            print(NEUTRAL_FMT % word)
                         else:
-                            print(f"{Colors.RED if card.type.value == 'RED' else Colors.BLUE}✗ {word} - Opponent's card! Turn ends.{Colors.RESET}")
+                            print(OPPONENT_FMT[card_type] % word)
                         
                         if turn_ended:
                             break
                             
                     except ValueError as e:
-                        print(f"{Colors.RED}Error guessing {word}: {e}{Colors.RESET}")
+                        print(GUESS_ERROR_FMT % (word, e))
                         break
                 
                 # End turn after all guesses if turn didn't end naturally
@@ -180,7 +207,7 @@ async def run_game(delay: float = 1.0):
                     game.end_turn_manually(current_team)
         
         print_scores(game)
-        time.sleep(delay)  # Small delay for readability
+        pause = asyncio.ensure_future(asyncio.sleep(delay))  # Small delay for readability
     
     # Game over
     print(f"\n{Colors.BOLD}{'='*60}{Colors.RESET}")
@@ -194,7 +221,8 @@ async def run_game(delay: float = 1.0):
     print_board(game, reveal_all=True)
     
     # Save history
-    history_file = game.save_history()
+    history_file = await game.save_history_async()
+    await llm_cache.flush()
     print(f"\n{Colors.GREEN}Game saved to: {history_file}{Colors.RESET}")
     
     return game
@@ -220,26 +248,14 @@ def replay_game(game_id: str, delay: float = 1.0):
     # Display board if cards are available
     cards = history.get("cards", [])
     if cards:
-        print("\n" + "="*60)
-        print(f"{Colors.BOLD}INITIAL BOARD{Colors.RESET}")
-        print("="*60)
-        
+        parts = [REPLAY_BOARD_HEADER]
         for i, card in enumerate(cards):
-            card_type = card.get("type", "NEUTRAL")
-            if card_type == "RED":
-                color = Colors.RED
-            elif card_type == "BLUE":
-                color = Colors.BLUE
-            elif card_type == "ASSASSIN":
-                color = Colors.GRAY + Colors.BOLD
-            else:
-                color = Colors.YELLOW
-            
-            word = f"{card.get('word', '???'):12}"
-            print(f"{color}{word}{Colors.RESET}", end="  ")
+            color = TYPE_COLORS.get(card.get("type", "NEUTRAL"), Colors.YELLOW)
+            parts.append(f"{color}{card.get('word', '???'):12}{Colors.RESET}  ")
             if (i + 1) % 5 == 0:
-                print()
-        print()
+                parts.append("\n")
+        parts.append("\n")
+        sys.stdout.write("".join(parts))
     
     print()
     
@@ -281,16 +297,16 @@ def list_games():
         print("No games found.")
         return
     
-    games = list(history_dir.glob("game_history_*.json"))
+    games = scan_history_files(history_dir)
     if not games:
         print("No games found.")
         return
     
     print(f"\n{Colors.BOLD}Saved Games:{Colors.RESET}")
     for game_file in games:
-        game_id = game_file.stem.replace("game_history_", "")
+        game_id = history_game_id(game_file.name)
         try:
-            with open(game_file, 'r') as f:
+            with open(game_file.path, 'r') as f:
                 data = json.load(f)
             winner = data.get("winner", "Incomplete")
         except (json.JSONDecodeError, IOError):
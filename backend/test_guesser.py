@@ -0,0 +1,48 @@
+import os
+import tempfile
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from fastapi.testclient import TestClient
+from game_engine import Team, GamePhase
+from agents import GuesserAgent
+import main
+
+
+class StubBatcher:
+    def __init__(self, reply):
+        self.reply = reply
+
+    async def submit(self, system_prompt, user_prompt, **options):
+        return self.reply
+
+
+def test_all_guesses_dropped_ends_turn():
+    os.chdir(tempfile.mkdtemp())
+    os.makedirs("history")
+
+    with TestClient(main.app) as client:
+        game_id = client.post("/api/game/create", json={}).json()["game_id"]
+        client.post(f"/api/game/{game_id}/move", json={"action_type": "CLUE", "payload": {"word": "ZQX", "number": 2}})
+        game = main.games.get(game_id)
+        guess = next(c.word for c in game.cards if not c.revealed)
+
+        # The verifier scores every candidate below the threshold
+        agent = GuesserAgent(Team.RED)
+        agent.llm = StubBatcher({"reasoning": "r", "words": [guess]})
+        agent.verifier = StubBatcher({"score": 0.0})
+        main._agent_cache[(game_id, Team.RED, False)] = agent
+
+        turn_count = game.turn_count
+        res = client.post(f"/api/game/{game_id}/agent-move", params={"expected_turn_count": turn_count}).json()
+
+        assert res["status"] == "success"
+        assert res["move"]["action"] == "END_TURN"
+        assert res["state"]["phase"] == GamePhase.BLUE_SPYMASTER.value
+        assert res["state"]["turn_count"] > turn_count
+        assert not game.get_card(guess).revealed
+        print(f"All guesses dropped: turn ended, now {res['state']['phase']}")
+
+
+if __name__ == "__main__":
+    test_all_guesses_dropped_ends_turn()
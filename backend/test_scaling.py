@@ -1,13 +1,15 @@
+from collections import Counter
 from game_engine import CodenamesGame, GameConfig, Team, CardType
 
 def test_counts(size):
     config = GameConfig(board_size=size)
     game = CodenamesGame(id="test", config=config)
     
-    red = sum(1 for c in game.cards if c.type == CardType.RED)
-    blue = sum(1 for c in game.cards if c.type == CardType.BLUE)
-    neutral = sum(1 for c in game.cards if c.type == CardType.NEUTRAL)
-    assassin = sum(1 for c in game.cards if c.type == CardType.ASSASSIN)
+    counts = Counter(c.type for c in game.cards)
+    red = counts[CardType.RED]
+    blue = counts[CardType.BLUE]
+    neutral = counts[CardType.NEUTRAL]
+    assassin = counts[CardType.ASSASSIN]
     
     print(f"Size {size}: Red={red}, Blue={blue}, Neutral={neutral}, Assassin={assassin}, Total={red+blue+neutral+assassin}")
 
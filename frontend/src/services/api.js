@@ -1,8 +1,13 @@
 import axios from 'axios';
+import { decodeMsgpack } from './msgpack';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000/api';
 const WS_URL = import.meta.env.VITE_WS_URL || 'ws://localhost:8000/ws';
 
+// Binary websocket frames start with a format tag byte (see WS_FORMAT_* in backend/main.py)
+const WS_FORMAT_JSON = 0x00;
+const WS_FORMAT_MSGPACK = 0x01;
+
 export const api = {
     createGame: async (difficulty = 'normal', players = null, llmModel = 'gpt-4o', boardSize = 25, accessToken = null) => {
         const config = accessToken ? { headers: { 'X-Access-Token': accessToken } } : {};
@@ -51,10 +56,24 @@ export class GameSocket {
 
     connect() {
         this.socket = new WebSocket(`${WS_URL}/${this.gameId}`);
+        // Broadcasts arrive as tagged binary frames, msgpack by default
+        this.socket.binaryType = 'arraybuffer';
+        this.decoder = new TextDecoder();
 
         this.socket.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-            this.onMessage(data);
+            if (typeof event.data === 'string') {
+                this.onMessage(JSON.parse(event.data));
+                return;
+            }
+            const bytes = new Uint8Array(event.data);
+            const body = bytes.subarray(1);
+            if (bytes[0] === WS_FORMAT_MSGPACK) {
+                this.onMessage(decodeMsgpack(body));
+            } else if (bytes[0] === WS_FORMAT_JSON) {
+                this.onMessage(JSON.parse(this.decoder.decode(body)));
+            } else {
+                console.error(`Unknown websocket frame format ${bytes[0]}`);
+            }
         };
 
         this.socket.onopen = () => {